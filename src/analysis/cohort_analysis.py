@@ -3,9 +3,6 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import seaborn as sns
-import matplotlib.pyplot as plt
-from operator import attrgetter
 
 class CohortAnalyzer:
     def __init__(self, data):
@@ -15,25 +12,36 @@ class CohortAnalyzer:
     def create_cohort_analysis(self, user_col='user_id', timestamp_col='timestamp', event_col='event'):
         """Create cohort analysis based on user first event date"""
         
-        # Get first event date for each user (cohort assignment)
-        user_first_event = self.data.groupby(user_col)[timestamp_col].min().reset_index()
-        user_first_event.columns = [user_col, 'cohort_date']
-        user_first_event['cohort_period'] = user_first_event['cohort_date'].dt.to_period('M')
+        # Month of each event as an integer (year * 12 + month), no Period objects
+        timestamps = self.data[timestamp_col]
+        event_month = timestamps.dt.year.to_numpy() * 12 + timestamps.dt.month.to_numpy() - 1
         
-        # Merge back with original data
-        cohort_data = self.data.merge(user_first_event, on=user_col)
+        # Cohort assignment: month of each user's first event
+        user_codes, users = pd.factorize(self.data[user_col])
+        first_month = np.full(len(users), event_month.max())
+        np.minimum.at(first_month, user_codes, event_month)
+        cohort_months, user_cohort = np.unique(first_month, return_inverse=True)
         
         # Calculate period number (months since first event)
-        cohort_data['event_period'] = cohort_data[timestamp_col].dt.to_period('M')
-        cohort_data['period_number'] = (
-            cohort_data['event_period'] - cohort_data['cohort_period']
-        ).apply(attrgetter('n'))
-        
-        # Create cohort table
-        cohort_table = cohort_data.groupby(['cohort_period', 'period_number'])[user_col].nunique().reset_index()
-        cohort_table = cohort_table.pivot(index='cohort_period', 
-                                         columns='period_number', 
-                                         values=user_col)
+        period_number = event_month - first_month[user_codes]
+        n_periods = period_number.max() + 1
+        
+        # Create cohort table: count each (user, period) pair once, bucketed by the user's cohort
+        user_periods = np.unique(user_codes.astype(np.int64) * n_periods + period_number)
+        cells = user_cohort[user_periods // n_periods] * n_periods + user_periods % n_periods
+        counts = np.bincount(cells, minlength=len(cohort_months) * n_periods).reshape(len(cohort_months), n_periods)
+        observed = counts.any(axis=0)
+        cohort_table = pd.DataFrame(
+            counts[:, observed],
+            index=pd.PeriodIndex(
+                [pd.Period(year=month // 12, month=month % 12 + 1, freq='M') for month in cohort_months],
+                name='cohort_period'
+            ),
+            columns=pd.Index(np.flatnonzero(observed), name='period_number')
+        )
+        
+        # Cohorts with no users in a period are missing, not zero
+        cohort_table = cohort_table.mask(cohort_table == 0)
         
         # Calculate retention rates
         cohort_sizes = cohort_table.iloc[:, 0]
@@ -1,15 +1,78 @@
+import os
+import functools
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import seaborn as sns
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 from scipy import stats
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Low-cardinality string columns, stored as categories so comparisons and groupbys use int codes
+CATEGORY_COLUMNS = ('event', 'source', 'device')
+
+# Arrow column types for the funnel CSV format; columns missing from a file are ignored.
+# Dictionary columns arrive in pandas as categories. Timestamps stay strings for
+# preprocess_data's pd.to_datetime, which accepts more formats than Arrow's parser;
+# user_id is inferred, since ids need not be numeric.
+CSV_SCHEMA = {
+    'timestamp': pa.string(),
+    **{col: pa.dictionary(pa.int32(), pa.string()) for col in CATEGORY_COLUMNS}
+}
+
+def _sorted_category(column):
+    """Column as a category with its categories in sorted order, as pandas' own inference gives"""
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        return column.astype('category')
+    return column.cat.reorder_categories(sorted(column.cat.categories))
+
+# Below this many events the NumPy presence matrix beats loading the compiled kernel
+NUMBA_MIN_ROWS = 50_000_000
+
+@functools.lru_cache(maxsize=1)
+def _funnel_depths_kernel():
+    """Compiled funnel depth kernel, or None without Numba; imported on first use only"""
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+    
+    @njit(parallel=True, cache=True)
+    def _funnel_depths(user_codes, event_codes, step_bits, n_users, n_steps):
+        """Number of leading funnel steps each user completed, from per-user step bitmasks"""
+        seen = np.zeros(n_users, dtype=np.int64)
+        for i in range(user_codes.size):
+            if user_codes[i] >= 0 and event_codes[i] >= 0:
+                seen[user_codes[i]] |= step_bits[event_codes[i]]
+        
+        depths = np.zeros(n_users, dtype=np.int64)
+        for u in prange(n_users):
+            depth = 0
+            while depth < n_steps and (seen[u] >> depth) & 1:
+                depth += 1
+            depths[u] = depth
+        return depths
+    
+    return _funnel_depths
+
+def _narrow_int32(column):
+    """Integer column as int32 when every value fits, otherwise unchanged"""
+    if not pd.api.types.is_integer_dtype(column) or column.empty:
+        return column
+    limits = np.iinfo(np.int32)
+    if column.min() < limits.min or column.max() > limits.max:
+        return column
+    return column.astype('int32')
+
 class FunnelAnalyzer:
     def __init__(self, data_path=None):
         self.data = None
@@ -19,10 +82,36 @@ class FunnelAnalyzer:
         if data_path:
             self.load_data(data_path)
     
-    def load_data(self, data_path):
-        """Load funnel data from CSV file"""
+    def load_data(self, data_path, usecols=None):
+        """Load funnel data from a CSV or Parquet file"""
+        data_path = str(data_path)
+        # Parsed CSVs are cached next to the source as dictionary-encoded Parquet
+        cache_path = os.path.splitext(data_path)[0] + '.cache.parquet'
         try:
-            self.data = pd.read_csv(data_path)
+            if data_path.endswith('.parquet'):
+                self.data = pd.read_parquet(data_path, columns=usecols)
+                if 'user_id' in self.data.columns:
+                    self.data['user_id'] = _narrow_int32(self.data['user_id'])
+            elif os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(data_path):
+                self.data = pd.read_parquet(cache_path, columns=usecols)
+            else:
+                # Multithreaded Arrow parse with fixed types for every column but user_id
+                table = pacsv.read_csv(
+                    data_path,
+                    read_options=pacsv.ReadOptions(block_size=64 << 20),
+                    convert_options=pacsv.ConvertOptions(column_types=CSV_SCHEMA, include_columns=usecols)
+                )
+                self.data = table.to_pandas()
+                if 'user_id' in self.data.columns:
+                    self.data['user_id'] = _narrow_int32(self.data['user_id'])
+                if usecols is None:
+                    try:
+                        self.data.to_parquet(cache_path, compression='zstd', index=False)
+                    except Exception as e:
+                        print(f"Note: Could not write Parquet cache {cache_path}: {e}")
+            for col in CATEGORY_COLUMNS:
+                if col in self.data.columns:
+                    self.data[col] = _sorted_category(self.data[col])
             print(f"Data loaded successfully: {len(self.data)} rows")
             print(f"Columns: {list(self.data.columns)}")
         except Exception as e:
@@ -37,11 +126,26 @@ class FunnelAnalyzer:
         # Convert timestamp to datetime
         self.data[timestamp_col] = pd.to_datetime(self.data[timestamp_col])
         
-        # Sort by user and timestamp
-        self.data = self.data.sort_values([user_col, timestamp_col])
-        
-        # Remove duplicates
-        self.data = self.data.drop_duplicates(subset=[user_col, event_col])
+        if pl is not None:
+            # Multithreaded sort and hash dedup in Polars on the key columns only, then take
+            # the surviving rows by position so labels and dtypes match the pandas path.
+            # NaT sorts last in pandas, so nulls must sort last here too.
+            keys = pl.from_pandas(
+                self.data[[user_col, timestamp_col, event_col]].reset_index(drop=True)
+                .assign(_row=np.arange(len(self.data)))
+            )
+            rows = (
+                keys.sort([user_col, timestamp_col], maintain_order=True, nulls_last=True)
+                .unique(subset=[user_col, event_col], keep='first', maintain_order=True)
+                ['_row'].to_numpy()
+            )
+            self.data = self.data.iloc[rows]
+        else:
+            # Sort by user and timestamp
+            self.data = self.data.sort_values([user_col, timestamp_col])
+            
+            # Remove duplicates
+            self.data = self.data.drop_duplicates(subset=[user_col, event_col])
         
         print("Data preprocessing completed")
         return self.data
@@ -52,45 +156,53 @@ class FunnelAnalyzer:
             print("No data available for analysis")
             return
         
-        funnel_results = []
+        events = self.data[event_col]
+        if not isinstance(events.dtype, pd.CategoricalDtype):
+            events = events.astype('category')
         
-        for i, step in enumerate(funnel_steps):
-            if i == 0:
-                # First step - all users who performed this event
-                users_at_step = set(self.data[self.data[event_col] == step][user_col])
-                total_users = len(users_at_step)
-            else:
-                # Subsequent steps - users who performed previous step AND this step
-                prev_users = funnel_results[i-1]['users']
-                current_step_users = set(self.data[self.data[event_col] == step][user_col])
-                users_at_step = prev_users.intersection(current_step_users)
-                total_users = len(users_at_step)
+        event_codes = events.cat.codes.to_numpy()
+        user_codes, users = pd.factorize(self.data[user_col])
+        user_codes = user_codes.astype(np.int32)
+        n_events = len(events.cat.categories)
+        step_codes = events.cat.categories.get_indexer(funnel_steps)
+        
+        funnel_depths = None
+        if len(events) >= NUMBA_MIN_ROWS and len(funnel_steps) < 63:
+            funnel_depths = _funnel_depths_kernel()
+        if funnel_depths is not None:
+            # Compiled path: each event sets the bits of the funnel steps it matches
+            step_bits = np.zeros(n_events, dtype=np.int64)
+            for i, code in enumerate(step_codes):
+                if code >= 0:
+                    step_bits[code] |= 1 << i
+            depths = funnel_depths(user_codes, event_codes, step_bits, len(users), len(funnel_steps))
             
-            # Calculate conversion rate
-            if i == 0:
-                conversion_rate = 100.0
-                step_conversion = 100.0
-            else:
-                conversion_rate = (total_users / funnel_results[0]['count']) * 100
-                step_conversion = (total_users / funnel_results[i-1]['count']) * 100
+            # Users reach step i when they completed more than i leading steps
+            counts = np.bincount(depths, minlength=len(funnel_steps) + 1)[::-1].cumsum()[::-1][1:]
+        else:
+            # One pass over the int codes: which users performed which event
+            valid = (event_codes >= 0) & (user_codes >= 0)
+            user_events = np.zeros((len(users), n_events + 1), dtype=bool)
+            user_events[user_codes[valid], event_codes[valid]] = True
+            
+            # Steps missing from the data map to the extra, all-False column
+            step_codes[step_codes < 0] = n_events
+            present = user_events[:, step_codes]
             
-            funnel_results.append({
-                'step': step,
-                'count': total_users,
-                'conversion_rate': conversion_rate,
-                'step_conversion': step_conversion,
-                'users': users_at_step
-            })
-        
-        self.funnel_data = pd.DataFrame([
-            {
-                'step': r['step'],
-                'count': r['count'],
-                'conversion_rate': r['conversion_rate'],
-                'step_conversion': r['step_conversion']
-            }
-            for r in funnel_results
-        ])
+            # A user reaches a step only if they also performed every previous step
+            reached = np.logical_and.accumulate(present, axis=1)
+            counts = reached.sum(axis=0)
+        
+        # Calculate conversion rates
+        conversion_rate = counts / counts[0] * 100
+        step_conversion = np.concatenate([[100.0], counts[1:] / counts[:-1] * 100])
+        
+        self.funnel_data = pd.DataFrame({
+            'step': funnel_steps,
+            'count': counts,
+            'conversion_rate': conversion_rate,
+            'step_conversion': step_conversion
+        })
         
         return self.funnel_data
     
@@ -1,96 +1,85 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 
 def generate_large_sample_data(num_users=10000, output_path='data/large_sample_funnel_data.csv'):
     """Generate a large sample dataset with 10k users for funnel analysis"""
-    
-    np.random.seed(42)
-    events = []
-    sources = ['organic', 'paid', 'social', 'email', 'direct']
-    devices = ['desktop', 'mobile', 'tablet']
-    
+
+    rng = np.random.default_rng(42)
+    sources = np.array(['organic', 'paid', 'social', 'email', 'direct'])
+    devices = np.array(['desktop', 'mobile', 'tablet'])
+
+    # Signup rate varies by source, first purchase rate varies by device
+    signup_rate = np.array([0.70, 0.75, 0.60, 0.80, 0.65])
+    purchase_rate = np.array([0.40, 0.30, 0.35])
+
     print(f"Generating sample data for {num_users} users...")
-    
-    for user in range(1, num_users + 1):
-        if user % 1000 == 0:
-            print(f"Processing user {user}/{num_users}")
-            
-        # Random user attributes
-        source = np.random.choice(sources, p=[0.35, 0.25, 0.20, 0.15, 0.05])  # Weighted probabilities
-        device = np.random.choice(devices, p=[0.45, 0.40, 0.15])  # Desktop, mobile, tablet
-        start_date = pd.Timestamp('2024-01-01') + pd.Timedelta(days=np.random.randint(0, 90))
-        
-        # Each user starts with page_view
-        events.append({
-            'user_id': user,
-            'event': 'page_view',
-            'timestamp': start_date,
-            'source': source,
-            'device': device
+
+    # Random user attributes, drawn for all users at once
+    user_ids = np.arange(1, num_users + 1, dtype=np.int32)
+    source_codes = rng.choice(len(sources), size=num_users, p=[0.35, 0.25, 0.20, 0.15, 0.05])  # Weighted probabilities
+    device_codes = rng.choice(len(devices), size=num_users, p=[0.45, 0.40, 0.15])  # Desktop, mobile, tablet
+    start_dates = np.datetime64('2024-01-01', 'ns') + rng.integers(0, 90, num_users).astype('timedelta64[D]')
+
+    # Every user starts with page_view; each later stage keeps a subset of the previous one
+    page_view_ts = start_dates
+
+    # 65% proceed to signup (varies by source)
+    signup_mask = rng.random(num_users) < signup_rate[source_codes]
+    signup_ts = page_view_ts[signup_mask] + rng.integers(1, 120, signup_mask.sum()).astype('timedelta64[m]')
+
+    # 35% of signups make first purchase (varies by device)
+    purchase_draw = rng.random(num_users) < purchase_rate[device_codes]
+    purchase_mask = signup_mask & purchase_draw
+    purchase_ts = signup_ts[purchase_draw[signup_mask]] + rng.integers(1, 72, purchase_mask.sum()).astype('timedelta64[h]')
+
+    # 30% make repeat purchase
+    repeat_draw = rng.random(num_users) < 0.30
+    repeat_mask = purchase_mask & repeat_draw
+    repeat_ts = purchase_ts[repeat_draw[purchase_mask]] + rng.integers(1, 21, repeat_mask.sum()).astype('timedelta64[D]')
+
+    # 20% become loyal customers (3+ purchases): 1-3 extra repeat purchases, 7-30 days apart
+    loyal_draw = rng.random(num_users) < 0.20
+    loyal_mask = repeat_mask & loyal_draw
+    extra_counts = rng.integers(1, 4, loyal_mask.sum())
+    gaps = np.cumsum(rng.integers(7, 30, extra_counts.sum()))
+    # Gap total before each user's first extra purchase: one entry per loyal user, none when there are none
+    group_offsets = np.concatenate([[0], gaps])[np.cumsum(extra_counts) - extra_counts]
+    loyal_ts = (
+        np.repeat(repeat_ts[loyal_draw[repeat_mask]], extra_counts)
+        + (gaps - np.repeat(group_offsets, extra_counts)).astype('timedelta64[D]')
+    )
+    loyal_users = np.repeat(np.flatnonzero(loyal_mask), extra_counts)
+
+    # Assemble each stage's events as column arrays
+    stages = [
+        ('page_view', np.arange(num_users), page_view_ts),
+        ('signup', np.flatnonzero(signup_mask), signup_ts),
+        ('first_purchase', np.flatnonzero(purchase_mask), purchase_ts),
+        ('repeat_purchase', np.flatnonzero(repeat_mask), repeat_ts),
+        ('repeat_purchase', loyal_users, loyal_ts),
+    ]
+    df = pd.concat([
+        pd.DataFrame({
+            'user_id': user_ids[idx],
+            'event': event,
+            'timestamp': ts,
+            'source': sources[source_codes[idx]],
+            'device': devices[device_codes[idx]]
         })
-        
-        # 65% proceed to signup (varies by source)
-        signup_rate = {
-            'organic': 0.70,
-            'paid': 0.75,
-            'social': 0.60,
-            'email': 0.80,
-            'direct': 0.65
-        }
-        
-        if np.random.random() < signup_rate[source]:
-            events.append({
-                'user_id': user,
-                'event': 'signup',
-                'timestamp': events[-1]['timestamp'] + pd.Timedelta(minutes=np.random.randint(1, 120)),
-                'source': source,
-                'device': device
-            })
-            
-            # 35% of signups make first purchase (varies by device)
-            purchase_rate = {
-                'desktop': 0.40,
-                'mobile': 0.30,
-                'tablet': 0.35
-            }
-            
-            if np.random.random() < purchase_rate[device]:
-                events.append({
-                    'user_id': user,
-                    'event': 'first_purchase',
-                    'timestamp': events[-1]['timestamp'] + pd.Timedelta(hours=np.random.randint(1, 72)),
-                    'source': source,
-                    'device': device
-                })
-                
-                # 30% make repeat purchase
-                if np.random.random() < 0.30:
-                    events.append({
-                        'user_id': user,
-                        'event': 'repeat_purchase',
-                        'timestamp': events[-1]['timestamp'] + pd.Timedelta(days=np.random.randint(1, 21)),
-                        'source': source,
-                        'device': device
-                    })
-                    
-                    # 20% become loyal customers (3+ purchases)
-                    if np.random.random() < 0.20:
-                        for i in range(np.random.randint(1, 4)):
-                            events.append({
-                                'user_id': user,
-                                'event': 'repeat_purchase',
-                                'timestamp': events[-1]['timestamp'] + pd.Timedelta(days=np.random.randint(7, 30)),
-                                'source': source,
-                                'device': device
-                            })
-    
-    # Create DataFrame
-    df = pd.DataFrame(events)
-    
-    # Save to CSV
-    df.to_csv(output_path, index=False)
-    
+        for event, idx, ts in stages
+    ], ignore_index=True)
+
+    # Keep each user's events together, in journey order
+    df = df.sort_values('user_id', kind='stable', ignore_index=True)
+    for col in ('event', 'source', 'device'):
+        df[col] = df[col].astype('category')
+
+    # Save to Parquet (dictionary-encoded, much faster to reload) or CSV
+    if str(output_path).endswith('.parquet'):
+        df.to_parquet(output_path, index=False)
+    else:
+        df.to_csv(output_path, index=False)
+
     print(f"\nSample data generated successfully!")
     print(f"Total events: {len(df):,}")
     print(f"Unique users: {df['user_id'].nunique():,}")
@@ -101,9 +90,9 @@ def generate_large_sample_data(num_users=10000, output_path='data/large_sample_f
     print(df['source'].value_counts())
     print(f"\nDevice distribution:")
     print(df['device'].value_counts())
-    
+
     return df
 
 if __name__ == "__main__":
     # Generate the large sample dataset
-    df = generate_large_sample_data(10000)
\ No newline at end of file
+    df = generate_large_sample_data(10000)
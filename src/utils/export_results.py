@@ -5,38 +5,81 @@ Run this script to generate and save all analysis results to the outputs folder
 
 import sys
 import os
+import io
+import functools
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from analysis.funnel_analyzer import FunnelAnalyzer
-from analysis.cohort_analysis import CohortAnalyzer
 import pandas as pd
 import numpy as np
 
+# Loading even the cached kernel costs ~0.3s against a few ms per million events saved,
+# so below this many events np.bincount is faster end to end
+NUMBA_MIN_ROWS = 100_000_000
+
+@functools.lru_cache(maxsize=1)
+def _daily_counts_kernel():
+    """Compiled daily count kernel, or None without Numba; imported on first use only"""
+    try:
+        from numba import njit, prange, get_num_threads
+    except ImportError:
+        return None
+    
+    @njit(parallel=True, cache=True)
+    def _daily_counts(day_codes, event_codes, n_days, n_events, n_chunks):
+        """Dense day x event count table, one private table per thread chunk summed at the end"""
+        chunk_size = (day_codes.size + n_chunks - 1) // n_chunks
+        local = np.zeros((n_chunks, n_days, n_events), dtype=np.int64)
+        for c in prange(n_chunks):
+            for i in range(c * chunk_size, min((c + 1) * chunk_size, day_codes.size)):
+                if day_codes[i] >= 0 and event_codes[i] >= 0:
+                    local[c, day_codes[i], event_codes[i]] += 1
+        return local.sum(axis=0)
+    
+    def daily_counts(day_codes, event_codes, n_days, n_events):
+        # Thread count is read outside the kernel; a dynamic global would stop Numba caching it
+        return _daily_counts(day_codes, event_codes, n_days, n_events, get_num_threads())
+    
+    return daily_counts
+
 def main():
     print("Starting Funnel Analysis Export...")
     
+    # Check for the data before importing the analyzer and its plotting/numeric stack
+    data_path = 'data/large_sample_funnel_data.csv'
+    if not os.path.exists(data_path):
+        print(f"Error loading data: {data_path} not found")
+        print("Run 'python src/generate_sample_data.py' first to create sample data")
+        return
+    
+    from analysis.funnel_analyzer import FunnelAnalyzer
+    
     # Initialize analyzer
     analyzer = FunnelAnalyzer()
     
     # Load the large sample data
-    try:
-        analyzer.load_data('data/large_sample_funnel_data.csv')
-        print("Data loaded successfully")
-    except Exception as e:
-        print(f"Error loading data: {e}")
+    analyzer.load_data(data_path)
+    if analyzer.data is None:
         print("Run 'python src/generate_sample_data.py' first to create sample data")
         return
+    print("Data loaded successfully")
     
     # Preprocess data
     analyzer.preprocess_data()
     
+    # Group keys as categories so every breakdown works on small int codes
+    for col in ('event', 'source', 'device'):
+        analyzer.data[col] = analyzer.data[col].astype('category')
+    
     # Define funnel steps
     funnel_steps = ['page_view', 'signup', 'first_purchase', 'repeat_purchase']
     
     # Create funnel analysis
     print("Creating funnel analysis...")
     funnel_data = analyzer.create_funnel_analysis(funnel_steps)
-    print(funnel_data)
+    if os.environ.get('FUNNEL_VERBOSE'):
+        print(funnel_data.to_string())
     
     # Save all visualizations
     print("Saving visualizations...")
@@ -45,31 +88,32 @@ def main():
     # Create additional analysis
     print("Creating additional analysis...")
     
-    # Source performance analysis
-    source_analysis = analyzer.data.groupby(['source', 'event']).size().unstack(fill_value=0)
-    if 'first_purchase' in source_analysis.columns and 'page_view' in source_analysis.columns:
-        source_analysis['conversion_rate'] = (source_analysis['first_purchase'] / source_analysis['page_view'] * 100).round(2)
-    source_analysis.to_csv('outputs/source_performance.csv')
-    
-    # Device performance analysis
-    device_analysis = analyzer.data.groupby(['device', 'event']).size().unstack(fill_value=0)
-    if 'first_purchase' in device_analysis.columns and 'page_view' in device_analysis.columns:
-        device_analysis['conversion_rate'] = (device_analysis['first_purchase'] / device_analysis['page_view'] * 100).round(2)
-    device_analysis.to_csv('outputs/device_performance.csv')
-    
-    # Time-based analysis
-    analyzer.data['date'] = analyzer.data['timestamp'].dt.date
-    daily_events = analyzer.data.groupby(['date', 'event']).size().unstack(fill_value=0)
-    daily_events.to_csv('outputs/daily_events.csv')
-    
-    # User journey analysis
-    user_journeys = analyzer.data.groupby('user_id')['event'].apply(list).reset_index()
-    user_journeys['journey_length'] = user_journeys['event'].apply(len)
-    journey_summary = user_journeys['journey_length'].value_counts().sort_index()
-    journey_summary.to_csv('outputs/journey_length_distribution.csv')
+    # Factorize events once; every per-dimension breakdown reuses the codes
+    event_codes, event_names = _codes(analyzer.data['event'])
+    
+    # The four breakdowns are independent and spend most of their time in GIL-releasing NumPy code
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # Source and device performance analysis
+        source_task = executor.submit(_export_performance, analyzer.data['source'], event_codes, event_names,
+                                      'outputs/source_performance.csv')
+        device_task = executor.submit(_export_performance, analyzer.data['device'], event_codes, event_names,
+                                      'outputs/device_performance.csv')
+        
+        # Time-based analysis
+        daily_task = executor.submit(_export_daily_events, analyzer.data['timestamp'], event_codes, event_names,
+                                     'outputs/daily_events.csv')
+        
+        # User journey analysis
+        journey_task = executor.submit(_export_journey_lengths, analyzer.data['user_id'],
+                                       'outputs/journey_length_distribution.csv')
+    
+    source_rows = source_task.result()
+    device_rows = device_task.result()
+    daily_task.result()
+    n_users = journey_task.result()
     
     # Create summary report
-    create_summary_report(analyzer, funnel_data, source_analysis, device_analysis)
+    create_summary_report(funnel_data, source_rows, device_rows, len(analyzer.data), n_users)
     
     print("\nAnalysis complete! Results saved to outputs/ folder:")
     print("Check the outputs/ directory for:")
@@ -77,58 +121,133 @@ def main():
     print("   - CSV data exports")
     print("   - Summary report")
 
-def create_summary_report(analyzer, funnel_data, source_analysis, device_analysis):
+def _codes(column):
+    """Integer codes and labels for a column, reusing category codes when available"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.cat.remove_unused_categories()
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column, sort=True)
+
+def _conversion_rate(table):
+    """first_purchase / page_view as a percentage rounded to 2 places, 0 where there were no page views"""
+    first_purchase = table['first_purchase'].to_numpy()
+    page_view = table['page_view'].to_numpy()
+    rate = np.divide(first_purchase, page_view, out=np.zeros(len(table)), where=page_view != 0)
+    return np.round(rate * 100, 2)
+
+def _write_rows(table, path):
+    """Write a breakdown table to CSV, returning its rows as (label, row dict) pairs for the report"""
+    table.to_csv(path)
+    return [(label, dict(zip(table.columns, values))) for label, *values in table.itertuples(name=None)]
+
+def _run_lengths(sorted_values):
+    """Length of each run of equal values in an already sorted array"""
+    if len(sorted_values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    run_starts = np.flatnonzero(np.diff(sorted_values)) + 1
+    return np.diff(np.concatenate([[0], run_starts, [len(sorted_values)]]))
+
+def _event_counts_by(column, event_codes, event_names):
+    """Count events per value of column as a dense value x event table"""
+    codes, values = _codes(column)
+    valid = (codes >= 0) & (event_codes >= 0)
+    
+    # Composite (value, event) key, counted in one pass and reshaped into the dense table
+    flat = codes[valid].astype(np.int64) * len(event_names) + event_codes[valid]
+    counts = np.bincount(flat, minlength=len(values) * len(event_names)).reshape(len(values), len(event_names))
+    return _count_table(counts, values, column.name, event_names)
+
+def _count_table(counts, values, name, event_names):
+    """Wrap a dense value x event count array in a labelled DataFrame"""
+    return pd.DataFrame(counts, index=pd.Index(values, name=name), columns=pd.Index(event_names, name='event'))
+
+def _export_performance(column, event_codes, event_names, path):
+    """Event counts and conversion rate per value of column, written to path; returns the report rows"""
+    analysis = _event_counts_by(column, event_codes, event_names)
+    if 'first_purchase' in analysis.columns and 'page_view' in analysis.columns:
+        analysis['conversion_rate'] = _conversion_rate(analysis)
+    return _write_rows(analysis, path)
+
+def _export_daily_events(timestamps, event_codes, event_names, path):
+    """Event counts per day, written to path"""
+    # Truncate to whole days as datetime64, not one Python date object per row
+    days = pd.Series(timestamps.to_numpy().astype('datetime64[D]'), name='date')
+    daily_counts = _daily_counts_kernel() if len(days) >= NUMBA_MIN_ROWS else None
+    if daily_counts is not None:
+        day_codes, day_values = _codes(days)
+        counts = daily_counts(day_codes, event_codes, len(day_values), len(event_names))
+        daily_events = _count_table(counts, day_values, 'date', event_names)
+    else:
+        daily_events = _event_counts_by(days, event_codes, event_names)
+    daily_events.index = daily_events.index.date
+    daily_events.rename_axis('date').to_csv(path)
+
+def _export_journey_lengths(user_ids, path):
+    """Distribution of events per user, written to path; returns the number of users"""
+    # preprocess_data leaves events sorted by user, so each journey is one contiguous run
+    journey_lengths = _run_lengths(user_ids.to_numpy())
+    
+    # Distribution by bincount, keeping only the lengths that occur
+    users_per_length = np.bincount(journey_lengths)
+    lengths = np.flatnonzero(users_per_length)
+    journey_summary = pd.Series(users_per_length[lengths], index=pd.Index(lengths, name='journey_length'), name='count')
+    journey_summary.to_csv(path)
+    return len(journey_lengths)
+
+def create_summary_report(funnel_data, source_rows, device_rows, n_events, n_users):
     """Create a text summary report"""
     
-    report = []
-    report.append("=" * 60)
-    report.append("USER FUNNEL ANALYSIS REPORT")
-    report.append("=" * 60)
-    report.append(f"Generated on: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    report.append(f"Total Events: {len(analyzer.data):,}")
-    report.append(f"Unique Users: {analyzer.data['user_id'].nunique():,}")
-    report.append("")
-    
-    report.append("FUNNEL PERFORMANCE:")
-    report.append("-" * 30)
-    for _, row in funnel_data.iterrows():
-        report.append(f"{row['step']:<20} {row['count']:>8,} users ({row['conversion_rate']:>5.1f}%)")
-    report.append("")
-    
-    report.append("TOP PERFORMING SOURCES:")
-    report.append("-" * 30)
-    if 'conversion_rate' in source_analysis.columns:
-        top_sources = source_analysis.nlargest(3, 'conversion_rate')
-        for source, row in top_sources.iterrows():
-            report.append(f"{source:<15} {row['conversion_rate']:>5.1f}% conversion")
-    report.append("")
-    
-    report.append("DEVICE PERFORMANCE:")
-    report.append("-" * 30)
-    if 'conversion_rate' in device_analysis.columns:
-        for device, row in device_analysis.iterrows():
-            report.append(f"{device:<15} {row['conversion_rate']:>5.1f}% conversion")
-    report.append("")
-    
-    report.append("KEY INSIGHTS:")
-    report.append("-" * 30)
+    report = io.StringIO()
+    
+    def line(text=""):
+        report.write(text + "\n")
+    
+    line("=" * 60)
+    line("USER FUNNEL ANALYSIS REPORT")
+    line("=" * 60)
+    line(f"Generated on: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    line(f"Total Events: {n_events:,}")
+    line(f"Unique Users: {n_users:,}")
+    line()
+    
+    line("FUNNEL PERFORMANCE:")
+    line("-" * 30)
+    for step, count, conversion_rate in funnel_data[['step', 'count', 'conversion_rate']].itertuples(index=False, name=None):
+        line(f"{step:<20} {count:>8,} users ({conversion_rate:>5.1f}%)")
+    line()
+    
+    line("TOP PERFORMING SOURCES:")
+    line("-" * 30)
+    rated_sources = [(source, row) for source, row in source_rows if 'conversion_rate' in row]
+    for source, row in heapq.nlargest(3, rated_sources, key=lambda r: r[1]['conversion_rate']):
+        line(f"{source:<15} {row['conversion_rate']:>5.1f}% conversion")
+    line()
+    
+    line("DEVICE PERFORMANCE:")
+    line("-" * 30)
+    for device, row in device_rows:
+        if 'conversion_rate' in row:
+            line(f"{device:<15} {row['conversion_rate']:>5.1f}% conversion")
+    line()
+    
+    line("KEY INSIGHTS:")
+    line("-" * 30)
     
     # Calculate biggest drop-off
-    step_drops = []
-    for i in range(1, len(funnel_data)):
-        drop = funnel_data.iloc[i-1]['step_conversion'] - funnel_data.iloc[i]['step_conversion']
-        step_drops.append((funnel_data.iloc[i]['step'], drop))
+    step_conversion = funnel_data['step_conversion'].to_numpy()
+    drops = step_conversion[:-1] - step_conversion[1:]
     
-    if step_drops:
-        biggest_drop = max(step_drops, key=lambda x: x[1])
-        report.append(f"- Biggest drop-off at: {biggest_drop[0]} ({biggest_drop[1]:.1f}% loss)")
+    if len(drops):
+        k = int(drops.argmax())
+        biggest_drop = (funnel_data['step'].iat[k + 1], float(drops[k]))
+        line(f"- Biggest drop-off at: {biggest_drop[0]} ({biggest_drop[1]:.1f}% loss)")
     
-    report.append(f"- Overall conversion rate: {funnel_data.iloc[-1]['conversion_rate']:.1f}%")
-    report.append(f"- {funnel_data.iloc[-1]['count']:,} users completed the full funnel")
+    line(f"- Overall conversion rate: {funnel_data.iloc[-1]['conversion_rate']:.1f}%")
+    line(f"- {funnel_data.iloc[-1]['count']:,} users completed the full funnel")
     
     # Save report
     with open('outputs/analysis_summary.txt', 'w') as f:
-        f.write('\n'.join(report))
+        f.write(report.getvalue())
     
     print("Summary report saved to outputs/analysis_summary.txt")
 
@@ -2,10 +2,15 @@ import dash
 from dash import dcc, html, Input, Output, callback
 import dash_bootstrap_components as dbc
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import sys
 import os
+import functools
+import glob
+import hashlib
+import inspect
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from analysis.funnel_analyzer import FunnelAnalyzer
 
@@ -80,74 +85,116 @@ def create_sample_data():
                                 'device': device
                             })
     
-    return pd.DataFrame(events)
+    return pd.DataFrame(events).astype({'user_id': 'int32'})
 
-# Initialize analyzer with sample data
-analyzer = FunnelAnalyzer()
-sample_data = create_sample_data()
-analyzer.data = sample_data
-analyzer.preprocess_data()
+def sample_cache_key():
+    """Short hash of the code that builds the sample data, so edits to it invalidate the cache"""
+    sources = inspect.getsource(create_sample_data) + inspect.getsource(inspect.getmodule(FunnelAnalyzer))
+    return hashlib.sha1(sources.encode()).hexdigest()[:12]
+
+# Preprocessed sample data is cached in data/ under a name keyed by sample_cache_key()
+SAMPLE_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+def load_or_build_sample(cache_dir=SAMPLE_CACHE_DIR):
+    """Load preprocessed sample data from the Feather cache, building it on first use"""
+    cache_path = os.path.join(cache_dir, f'_sample_cache-{sample_cache_key()}.feather')
+    if os.path.exists(cache_path):
+        return pd.read_feather(cache_path)
+    
+    builder = FunnelAnalyzer()
+    builder.data = create_sample_data()
+    sample_data = builder.preprocess_data().reset_index(drop=True)
+    
+    # Drop caches left behind by older versions of the generator or preprocessing
+    for stale_path in glob.glob(os.path.join(cache_dir, '_sample_cache*.feather')):
+        os.remove(stale_path)
+    sample_data.to_feather(cache_path)
+    return sample_data
 
 funnel_steps = ['page_view', 'signup', 'first_purchase', 'repeat_purchase']
-analyzer.create_funnel_analysis(funnel_steps)
 
-# App layout
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.H1("User Funnel Analysis Dashboard", className="text-center mb-4"),
-            html.Hr()
-        ])
-    ]),
+@functools.lru_cache(maxsize=1)
+def get_analyzer():
+    """Build the analyzer with sample data once per process, on first use"""
+    analyzer = FunnelAnalyzer()
+    analyzer.data = load_or_build_sample()
+    analyzer.create_funnel_analysis(funnel_steps)
+    return analyzer
+
+@functools.lru_cache(maxsize=1)
+def get_figures():
+    """Funnel and conversion figures as plain dicts, built once since funnel_data never changes"""
+    analyzer = get_analyzer()
+    return analyzer.plot_funnel_chart().to_dict(), analyzer.plot_conversion_rates().to_dict()
+
+def build_layout(funnel_figure, conversion_figure):
+    """App layout around the given funnel and conversion figures"""
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                html.H1("User Funnel Analysis Dashboard", className="text-center mb-4"),
+                html.Hr()
+            ])
+        ]),
     
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4("Funnel Overview", className="card-title"),
-                    dcc.Graph(
-                        id='funnel-chart',
-                        figure=analyzer.plot_funnel_chart()
-                    )
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Funnel Overview", className="card-title"),
+                        dcc.Graph(
+                            id='funnel-chart',
+                            figure=funnel_figure
+                        )
+                    ])
                 ])
-            ])
-        ], width=12)
-    ], className="mb-4"),
+            ], width=12)
+        ], className="mb-4"),
     
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4("Conversion Rates", className="card-title"),
-                    dcc.Graph(
-                        id='conversion-chart',
-                        figure=analyzer.plot_conversion_rates()
-                    )
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Conversion Rates", className="card-title"),
+                        dcc.Graph(
+                            id='conversion-chart',
+                            figure=conversion_figure
+                        )
+                    ])
                 ])
-            ])
-        ], width=12)
-    ], className="mb-4"),
+            ], width=12)
+        ], className="mb-4"),
     
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4("Funnel Metrics Summary", className="card-title"),
-                    html.Div(id='metrics-table')
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Funnel Metrics Summary", className="card-title"),
+                        html.Div(id='metrics-table')
+                    ])
                 ])
-            ])
-        ], width=6),
+            ], width=6),
         
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4("Key Insights", className="card-title"),
-                    html.Div(id='insights')
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Key Insights", className="card-title"),
+                        html.Div(id='insights')
+                    ])
                 ])
-            ])
-        ], width=6)
-    ])
-], fluid=True)
+            ], width=6)
+        ])
+    ], fluid=True)
+
+def serve_layout():
+    """Build the app layout with the cached figures; called by Dash on page load"""
+    return build_layout(*get_figures())
+
+# App layout. Dash calls a function layout once when it is assigned, to validate it,
+# unless validation_layout is already set; the figure-free skeleton has the same ids
+# and keeps the analyzer from being built at import time
+app.validation_layout = build_layout({}, {})
+app.layout = serve_layout
 
 @callback(
     Output('metrics-table', 'children'),
@@ -155,6 +202,7 @@ app.layout = dbc.Container([
 )
 def update_metrics_table(figure):
     """Update the metrics summary table"""
+    analyzer = get_analyzer()
     if analyzer.funnel_data is None:
         return "No data available"
     
@@ -187,18 +235,16 @@ def update_metrics_table(figure):
 )
 def update_insights(figure):
     """Generate key insights from the funnel data"""
+    analyzer = get_analyzer()
     if analyzer.funnel_data is None:
         return "No insights available"
     
     insights = []
     
     # Find biggest drop-off
-    step_drops = []
-    for i in range(1, len(analyzer.funnel_data)):
-        drop = analyzer.funnel_data.iloc[i-1]['step_conversion'] - analyzer.funnel_data.iloc[i]['step_conversion']
-        step_drops.append((analyzer.funnel_data.iloc[i]['step'], drop))
-    
-    biggest_drop = max(step_drops, key=lambda x: x[1])
+    drops = -np.diff(analyzer.funnel_data['step_conversion'].to_numpy())
+    biggest = drops.argmax()
+    biggest_drop = (analyzer.funnel_data['step'].iat[biggest + 1], drops[biggest])
     
     insights.extend([
         html.P(f"Biggest drop-off: {biggest_drop[0]} ({biggest_drop[1]:.1f}% loss)", className="mb-2"),